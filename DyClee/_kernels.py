@@ -0,0 +1,99 @@
+import numpy as np
+
+# Compiled kernels for the innermost distance and overlap tests of DyClee.
+# Numba is optional: when it is not installed, the equivalent vectorized NumPy
+# implementations are used instead. Both compute the same results, including
+# on NaN centers and on exact distance ties, as Manhattan distances are summed
+# in dimension order in both.
+try:
+	from numba import njit, prange
+except ImportError:
+	njit = None
+
+
+# Returns a boolean mask of the rows of center matrix C that are reachable
+# from instance X, i.e. within halved along every dimension.
+def reachable_mask_numpy(C, X, halved):
+	return (np.abs(C - X) < halved).all(axis=1)
+
+
+# Returns the rows among idx of center matrix C with the minimum Manhattan
+# distance to instance X, in their order in idx. Rows at a NaN distance are
+# never closest.
+def closest_rows_numpy(C, idx, X):
+	dists = np.zeros(len(idx), dtype=np.float64)
+	for j in range(C.shape[1]):
+		dists += np.abs(C[idx, j] - X[j])
+	valid = ~np.isnan(dists)
+	if not valid.any():
+		return idx[:0]
+	return idx[dists == dists[valid].min()]
+
+
+# Returns the boolean connectivity matrix of the rows of center matrix C:
+# two rows are connected if their hyperboxes overlap along at least
+# common_dims dimensions. Rows are processed in blocks to bound the memory of
+# the pairwise differences.
+def connectivity_matrix_numpy(C, sizes, common_dims):
+	n = C.shape[0]
+	conn = np.empty((n, n), dtype=bool)
+	for start in range(0, n, 512):
+		diff = np.abs(C[start:start + 512, None, :] - C)
+		conn[start:start + 512] = (diff < sizes).sum(axis=2) >= \
+			common_dims
+	return conn
+
+
+if njit is not None:
+	@njit(cache=True)
+	def reachable_mask(C, X, halved):
+		n, d = C.shape
+		mask = np.empty(n, dtype=np.bool_)
+		for i in range(n):
+			reachable = True
+			for j in range(d):
+				if not abs(C[i, j] - X[j]) < halved[j]:
+					reachable = False
+					break
+			mask[i] = reachable
+		return mask
+
+
+	@njit(cache=True)
+	def closest_rows(C, idx, X):
+		d = C.shape[1]
+		closest = np.empty(idx.shape[0], dtype=np.int64)
+		count = 0
+		min_dist = np.inf
+		for k in range(idx.shape[0]):
+			i = idx[k]
+			dist = 0.0
+			for j in range(d):
+				dist += abs(C[i, j] - X[j])
+			if dist < min_dist:
+				min_dist = dist
+				closest[0] = i
+				count = 1
+			elif dist == min_dist: # Ties
+				closest[count] = i
+				count += 1
+		return closest[:count]
+
+
+	@njit(cache=True, parallel=True)
+	def connectivity_matrix(C, sizes, common_dims):
+		n, d = C.shape
+		conn = np.empty((n, n), dtype=np.bool_)
+		for a in prange(n):
+			for b in range(n):
+				numoverlapdims = 0
+				for j in range(d):
+					if abs(C[a, j] - C[b, j]) < sizes[j]:
+						numoverlapdims += 1
+				conn[a, b] = numoverlapdims >= common_dims
+		return conn
+
+else:
+	reachable_mask = reachable_mask_numpy
+	closest_rows = closest_rows_numpy
+	connectivity_matrix = connectivity_matrix_numpy
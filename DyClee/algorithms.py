@@ -1,14 +1,12 @@
-from copy import deepcopy
-from itertools import chain
-from collections import deque
+from collections import deque, OrderedDict
 import math
-from statistics import multimode
 
 import numpy as np
-from sklearn.neighbors import KDTree
+from scipy.spatial import cKDTree
 
-from .clusters import FinalCluster, MicroCluster
-from .utilities import manhattan_distance
+from ._kernels import closest_rows, connectivity_matrix, reachable_mask
+from .clusters import (A_LIST, LTM_LIST, NO_LIST, O_LIST, UNCLASSED,
+	FinalCluster, MicroCluster, MicroClusterStore, Snapshot)
 
 # Citation:
 # Nathalie Barbosa Roa, Louise Travé-Massuyès, Victor Hugo Grisales.
@@ -53,12 +51,17 @@ class SerialDyClee:
 	# @param dense_connect		Only allow connectivity by dense microclusters.
 	# @param label_voting		Use mode with voting for tie breaking for
 	#							label propagation.
+	# @param dtype				Floating point type of the normalized
+	#							instances and micro-cluster centers. Passing
+	#							np.float32 halves the memory traffic of the
+	#							distance stage, but changes results slightly.
 	def __init__(self, phi, forget_method=None, ltm=False,
 		unclass_accepted=True, minimum_mc=False, multi_density=False,
 		context=None, t_global=1, uncdim=0, kdtree=False, snapshot_alpha=2,
 		snapshot_l=2, var_check=False, dense_connect=False,
-		label_voting=False):
+		label_voting=False, dtype=np.float64):
 		assert phi >= 0 and phi <= 1, "Invalid phi given"
+		assert snapshot_alpha > 1, "Invalid snapshot_alpha given"
 		if phi > 0.5:
 			print("Warning: relative size (phi) > 0.5 may yield poor results")
 
@@ -88,9 +91,10 @@ class SerialDyClee:
 		if kdtree:
 			self.spatial_search = self._search_kdtree
 			self.kdtree = None
-			self.center_map = None
+			self._neighbor_lists = None
 		else:
 			self.spatial_search = self._search_all_clusters
+			self._conn = None
 		self.snapshot_alpha = snapshot_alpha
 		self.snapshot_l = snapshot_l
 		self.max_snapshots = (snapshot_alpha ** snapshot_l) + 1
@@ -100,6 +104,7 @@ class SerialDyClee:
 		self.O_list = [] # Low density microclusters
 		self.long_term_mem = [] # All microclusters once dense, now low density
 		self.snapshots = {} # Need to define how this is maintained
+		self._mc = None # Columnar MicroCluster storage, created on first run
 
 		# Dimensionality reduction 
 		self.var_check = var_check
@@ -109,33 +114,46 @@ class SerialDyClee:
 		self.density_check = self._is_dense if dense_connect else \
 			self._is_not_outlier
 		self.label_voting = label_voting
+		self.dtype = dtype
 
 		# Other
 		self.hyperbox_sizes = self._get_hyperbox_sizes() if context is not \
 			None else None
 		self.hyperbox_volume = self._get_hyperbox_volume() if context is not \
 			None else None
+		self._halved_sizes = (self.hyperbox_sizes / 2).astype(dtype) if \
+			context is not None else None
 
 		self.id_prefix = "dyclee" + str(np.random.default_rng().integers(
 			1000)) + "_"
 		self.next_class_id = 0
 
+	# Helper to update the per-dimension variances of the instances seen so
+	# far from the running sums. Only needed once per density stage.
+	def _update_variances(self):
+		np.divide(self._total_SS, self._instance_count, out=self.variances)
+		self.variances -= np.square(self._total_S / self._instance_count)
+
+
 	# Helper to calculate microcluster hyperbox sizes along each dimension.
-	# Size = phi * |dmax - dmin|
+	# Size = phi * |dmax - dmin|, i.e. phi along every normalized dimension.
 	def _get_hyperbox_sizes(self):
-		return self.phi * np.ones(self.context.shape[1], dtype=np.float64)
+		return np.full(self.context.shape[1], self.phi, dtype=np.float64)
 
 
 	# Helper to calculate the current microcluster hyperbox volume.
-		# Vol = product of all sizes
+	# Vol = product of all sizes = phi^d
 	def _get_hyperbox_volume(self):
-		return np.prod(self._get_hyperbox_sizes())
+		return self.phi ** self.context.shape[1]
 
 
+	# Returns the (negative) class code of a newly generated label.
 	def _get_next_class_id(self):
 		temp = self.id_prefix + str(self.next_class_id)
 		self.next_class_id += 1
-		return temp
+		code = -self.next_class_id
+		self._mc.class_labels[code] = temp
+		return code
 
 
 	def _is_dense(self, uC):
@@ -147,143 +165,191 @@ class SerialDyClee:
 
 
 	# Normalization function for use in cases of no context matrix provided;
-	# also, must update the hypervolumes of all microclusters.
+	# also, must update the hypervolumes of all microclusters. The context is
+	# updated in place, and its differences only when it changed. Features
+	# with no observed range yet (e.g. constant ones) are not scaled.
 	def _adaptive_normalize_and_update(self, X):
-		diffmin = X - self.context[0]
-		diffmax = X - self.context[1]
-		diffminbool = diffmin < 0
-		diffmaxbool = diffmax > 0
-		updatemins = np.any(diffminbool)
-		updatemaxs = np.any(diffmaxbool)
+		context = self.context
+		updatemins = np.less(X, context[0]).any()
+		updatemaxs = np.greater(X, context[1]).any()
 		if updatemins:
-			self.context[0] = self.context[0] + np.where(diffminbool,
-				diffmin, 0)
+			np.minimum(context[0], X, out=context[0])
 		if updatemaxs:
-			self.context[1] = self.context[1] + np.where(diffmaxbool,
-				diffmax, 0)
+			np.maximum(context[1], X, out=context[1])
 
 		# Update differences
-		self.context[2] = self.context[1] - self.context[0]
+		if updatemins or updatemaxs:
+			np.subtract(context[1], context[0], out=context[2])
+			self._adaptive_ranges = np.where(context[2] == 0, 1, context[2])
 
-		# Update hyperbox statistics
-		self.hyperbox_sizes = self._get_hyperbox_sizes()
-		self.hyperbox_volume = self._get_hyperbox_volume()
-
-		# Need to re-normalize all existing microclusters and return normalized
-		# point
+		# Need to re-normalize all existing microclusters
+		return ((X - context[0]) / self._adaptive_ranges).astype(self.dtype,
+			copy=False)
 
 	# Normalization function for use in case of passed context matrix.
 	def _normalize(self, X):
-		return ((X - self.context[0])/(self.context[2]))
-
-
-	# Helper function to determine if a microcluster is reachable from new
-	# instance X.
-	def _is_reachable(self, microcluster, X):
-		diff = np.abs(X - microcluster.center)
-		halvedsize = self.hyperbox_sizes / 2
-		return np.all(diff < halvedsize)
-
-
-	# Helper function to find all reachable microclusters in a given list
-	def _find_reachables(self, curr_list, X):
-		return [uC for uC in curr_list if self._is_reachable(uC, X)]
-
-
-	# Helper function to determine if two microclusters are connected.
+		return ((X - self.context[0])/(self.context[2])).astype(self.dtype,
+			copy=False)
+
+
+	# Helper function to add a microcluster to the O-list.
+	def _add_to_O_list(self, uC):
+		uC.list_tag = O_LIST
+		uC.list_pos = len(self.O_list)
+		self.O_list.append(uC)
+
+
+	# Helper function to add a microcluster to long term memory at time tX.
+	# Microclusters are not decayed while in long term memory, so pending
+	# forgetting is applied up to tX beforehand.
+	def _add_to_long_term_mem(self, uC, tX):
+		self._apply_decay(uC, tX)
+		uC.list_tag = LTM_LIST
+		uC.list_pos = len(self.long_term_mem)
+		self.long_term_mem.append(uC)
+
+
+	# Helper function to update the list tags of the microclusters after the
+	# density stage at time tX replaces the A-list and O-list. Compacts the
+	# storage once most of its rows belong to forgotten microclusters.
+	def _update_lists(self, tX, new_A, new_O, long_term_mem_additional):
+		mc = self._mc
+		mc.list_tag[self._rows] = NO_LIST
+		self.A_list = new_A
+		self.O_list = new_O
+		for list_tag, uClist in ((A_LIST, new_A), (O_LIST, new_O)):
+			rows = np.array([uC.idx for uC in uClist], dtype=np.int64)
+			mc.list_tag[rows] = list_tag
+			mc.list_pos[rows] = np.arange(len(rows))
+		for uC in long_term_mem_additional:
+			self._add_to_long_term_mem(uC, tX)
+		if 2 * np.count_nonzero(mc.list_tag[:mc.n] == NO_LIST) > mc.n:
+			mc.compact()
+
+
+	# Helper function to find the microclusters reachable from new instance X,
+	# scanning the A-list, O-list and long term memory at once. Returns the tag
+	# of the first list, in that order of priority, with reachable
+	# microclusters, and their storage rows.
+	def _find_reachables(self, X):
+		mc = self._mc
+		reachable = np.flatnonzero(reachable_mask(mc.center[:mc.n], X,
+			self._halved_sizes))
+		tags = mc.list_tag[reachable]
+		for list_tag in (A_LIST, O_LIST, LTM_LIST):
+			rows = reachable[tags == list_tag]
+			if len(rows) != 0 and (list_tag != LTM_LIST or self.ltm):
+				return list_tag, rows
+		return NO_LIST, reachable[:0]
+
+
+	# Helper function to index the A-list and O-list microclusters for the
+	# density stage. Gathers their storage rows (self._rows) and centers into
+	# a single matrix whose rows follow the order of self._uCs, storing each
+	# microcluster's row index.
+	def _index_microclusters(self):
+		self._uCs = self.A_list + self.O_list
+		self._rows = np.array([uC.idx for uC in self._uCs], dtype=np.int64)
+		self._center_matrix = self._mc.center[self._rows]
+		self._mc.density_row[self._rows] = np.arange(len(self._rows))
+
+
+	# Helper function to determine which density stage microclusters are
+	# connected, for all pairs at once.
 	# Implements definition 3.2 (page 7) - doesn't insist on a particular
 	# subset of features, only that a subset could be created to satisfy
 	# overlap among (d - uncdim) dimensions.
-	def _is_connected(self, microclusterA, microclusterB):
-		diff = np.abs(microclusterA.center - microclusterB.center)
-		halvedsize = self.hyperbox_sizes
-		numoverlapdims = 0
+	def _construct_connectivity(self):
+		centers = self._center_matrix
+		sizes = self.hyperbox_sizes
 
 		# Dimensionality reduction
 		if self.var_check:
 			feature_selection = self.variances.argsort().flatten()[
 				-(self.common_dims):]
-			for i in range(len(diff)):
-				if i in feature_selection:
-					if diff[i] < halvedsize[i]:
-						numoverlapdims += 1
-		else:
-			numoverlapdims = np.sum((diff < halvedsize).astype(np.uint8))
-		if numoverlapdims >= self.common_dims: # Check for sufficient overlap
-			return True
-		else:
-			return False
+			centers = centers[:, feature_selection]
+			sizes = sizes[feature_selection]
+
+		self._conn = connectivity_matrix(np.ascontiguousarray(centers),
+			np.ascontiguousarray(sizes, dtype=self.dtype), self.common_dims)
 
 
-	# Helper function to find all neighbors in the density stage by searching
-	# all clusters.
-	def _search_all_clusters(self, curruC):
-		return [uC for uC in chain(self.A_list, self.O_list) if \
-			self._is_connected(uC, curruC)]
+	# Helper function to find the rows of all neighbors of the microcluster at
+	# a given density stage row, using the connectivity matrix.
+	def _search_all_clusters(self, row):
+		return np.flatnonzero(self._conn[row])
 
 
-	# Helper function to construct KDTree and center map dictionary, which
-	# references microclusters based on their center.
+	# Helper function to construct KDTree over the density stage center matrix
+	# and find the neighbors of every microcluster in one batched query.
 	def _construct_kdtree(self):
-		self.center_map = {}
-		data = []
-		for uC in chain(self.A_list, self.O_list):
-			center = uC.center
-			self.center_map[str(center)] = uC
-			data.append(center)
-		data = np.vstack(data)
-		self.kdtree = KDTree(data, metric="manhattan")
-
-
-	# Helper function to find all neighbors in the density stage by using a
-	# kdtree.
-	def _search_kdtree(self, curruC):
-		match_indices = self.kdtree.query_radius(curruC.center,
-			self.phi / 2)[0]
-		data = self.kdtree.get_arrays()[0]
-		return [self.center_map[str(arr)] for arr in data[match_indices]]
-
-
-	# Helper function to manage final cluster snapshot history
+		self.kdtree = cKDTree(self._center_matrix)
+		self._neighbor_lists = self.kdtree.query_ball_point(
+			self._center_matrix, r=self.phi / 2, p=1)
+
+
+	# Helper function to find the rows of all neighbors of the microcluster at
+	# a given density stage row, using the kdtree query results.
+	def _search_kdtree(self, row):
+		return self._neighbor_lists[row]
+
+
+	# Helper function to manage final cluster snapshot history. Following the
+	# pyramidal time frame, a snapshot taken at time tX is stored only at the
+	# highest order i such that tX is divisible by alpha^i, and each order
+	# keeps its max_snapshots most recent snapshots.
 	def _update_snapshots(self, tX, clusters):
-		if tX == 0:
-			max_order = 0
-		else:
-			max_order = math.floor(math.log(tX, self.snapshot_alpha))
-		for order in range(max_order + 1):
-			if tX % (self.snapshot_alpha ** order) == 0:
-				if order not in self.snapshots:
-					self.snapshots[order] = {tX : clusters}
-				else:
-					self.snapshots[order][tX] = clusters
-					tstamps = list(self.snapshots[order].keys())
-					tstamps.sort()
-					if len(self.snapshots[order]) > self.max_snapshots:
-						del self.snapshots[order][tstamps[0]]
-		for order in range(len(self.snapshots)):
-			for k in list(self.snapshots[order].keys()):
-				if k % (self.snapshot_alpha ** (order + 1)) == 0:
-					del self.snapshots[order][k]
+		order = 0
+		if tX != 0:
+			while tX % (self.snapshot_alpha ** (order + 1)) == 0:
+				order += 1
+		if order not in self.snapshots:
+			self.snapshots[order] = OrderedDict()
+		self.snapshots[order][tX] = clusters
+		if len(self.snapshots[order]) > self.max_snapshots:
+			self.snapshots[order].popitem(last=False) # Drop oldest
+
+
+	# Helper function to lazily apply the forgetting process to a microcluster
+	# up to time tX; only microclusters being touched are decayed.
+	def _apply_decay(self, uC, tX):
+		if uC.last_touched != tX:
+			uC.update_cluster(tX)
+
+
+	# Helper function to insert instance X into a microcluster, decaying it
+	# first and refreshing its density afterwards.
+	def _insert(self, uC, X, tX, X_class):
+		self._apply_decay(uC, tX)
+		uC.insert(X, tX, X_class)
+		uC.update_density(self.hyperbox_volume)
+
+
+	# Helper function to recompute the densities of the density stage
+	# microclusters at time tX in one vectorized pass, accounting for pending
+	# forgetting. Densities are kept in self._Dk_arr, following the rows of
+	# self._uCs.
+	def _refresh_densities(self, tX):
+		mc = self._mc
+		nk = mc.nk[self._rows]
+		if self.forget_method is not None:
+			nk *= np.array([mc.decay_function(tX, t) for t in
+				mc.last_touched[self._rows]], dtype=np.float64)
+		self._Dk_arr = nk / self.hyperbox_volume
+		mc.Dk[self._rows] = self._Dk_arr
 
 
 	# Helper function for finding the best neighbor microcluster for insertion
-	# in a list of microclusters by distance, breaking ties based on density.
-	def _find_best_neighbor(self, neighbor_list, X):
-		closest = []
-		min_dist = np.inf
-
-		for uC in neighbor_list:
-			dist = manhattan_distance(uC.center, X)
-			if dist < min_dist:
-				closest = [uC]
-				min_dist = dist
-			elif dist == min_dist: # Ties
-				closest.append(uC)
-
-		# Sort by density to break ties among equally close
+	# among the reachable storage rows (idx) of one list, by distance, breaking
+	# ties based on density and then on position in the list.
+	def _find_best_neighbor(self, idx, X):
+		mc = self._mc
+		closest = closest_rows(mc.center, idx, X)
+		closest = closest[np.argsort(mc.list_pos[closest], kind="stable")]
+
+		# Least dense first to break ties among equally close
 		# microclusters
-		closest.sort(key = lambda uC : uC.Dk)
-		return closest[0]
+		return mc.handles[closest[mc.Dk[closest].argmin()]]
 
 	# Implements algorithm 1, distance stage (page 6).
 	def _distance_stage(self, X, tX, X_class=None):
@@ -294,66 +360,44 @@ class SerialDyClee:
 			# after only one insertion.
 			volume = self.hyperbox_volume if self.hyperbox_volume is not None \
 				else 1
-			new_uC = MicroCluster(X, tX, volume, X_class, self.forget_method)
-			self.O_list.append(new_uC)
+			new_uC = MicroCluster(self._mc, X, tX, volume, X_class)
+			self._add_to_O_list(new_uC)
 			return new_uC
-		else: # First check A-list
-			Reachables = self._find_reachables(self.A_list, X)
-			if len(Reachables) != 0: # If there are reachable microclusters
+		else: # Check A-list, then O-list, then long term memory
+			source, Reachables = self._find_reachables(X)
+			if source == A_LIST or source == O_LIST:
+				# Find closest uC in Reachables
 				best_match = self._find_best_neighbor(Reachables, X)
-				best_match.insert(X, tX, X_class)
+				self._insert(best_match, X, tX, X_class)
 				return best_match
-			else: # Then check O-list
-				Reachables = self._find_reachables(self.O_list, X)
-				if len(Reachables) != 0: # If there are reachable microclusters
-					# Find closest uC in Reachables
-					best_match = self._find_best_neighbor(Reachables, X)
-					best_match.insert(X, tX, X_class)
-					return best_match
-				else: # Check long term memory
-					Reachables = self._find_reachables(self.long_term_mem, X)
-					if self.ltm and len(Reachables) != 0:
-						best_match = self._find_best_neighbor(Reachables, X)
-						resurrected = deepcopy(best_match)
-						resurrected.insert(X, tX, X_class)
-						self.O_list.append(resurrected)
-						return resurrected
-					else: # Create uC with X info
-						volume = self.hyperbox_volume if self.hyperbox_volume \
-							is not None else 1
-						new_uC = MicroCluster(X, tX, volume, X_class,
-							self.forget_method)
-						self.O_list.append(new_uC)
-						return new_uC
-
-	# Returns average and median density of given list of clusters.
-	def _get_avg_med_density(self, clist):
-		cla = np.array([uC.Dk for uC in clist], dtype=np.float64)
-		return np.mean(cla), np.median(cla)
-
-	# Given a list of micro-clusters contributing to a final cluster, returns
-	# the label, projected center, density and max distance (a measure of
-	# spread) of the final cluster
-	def _calculate_final_cluster(self, fclist):
-		num_contrib_mc = len(fclist)
-		center = np.zeros((fclist[0].center.shape),
-			dtype=np.float64)
-		avg_density = 0
-		max_distance = 0
-		label = fclist[0].Classk
-
-		for uC in fclist:
-			center += uC.center
-			avg_density += uC.Dk
-
-		# Take averages and find max distance
-		center /= num_contrib_mc
-		avg_density /= num_contrib_mc
-		for uC in fclist:
-			dist = manhattan_distance(center, uC.center)
-			if dist > max_distance:
-				max_distance = dist
-
+			elif source == LTM_LIST:
+				best_match = self._find_best_neighbor(Reachables, X)
+				# The clone starts decaying from its revival only
+				resurrected = best_match.clone_state()
+				resurrected.last_touched = tX
+				self._insert(resurrected, X, tX, X_class)
+				self._add_to_O_list(resurrected)
+				return resurrected
+			else: # Create uC with X info
+				volume = self.hyperbox_volume if self.hyperbox_volume \
+					is not None else 1
+				new_uC = MicroCluster(self._mc, X, tX, volume, X_class)
+				self._add_to_O_list(new_uC)
+				return new_uC
+
+	# Returns average and median density of given array of densities.
+	def _get_avg_med_density(self, Dk):
+		return np.mean(Dk), np.median(Dk)
+
+	# Given the density stage rows of the micro-clusters contributing to a
+	# final cluster, returns the label, projected center, density and max
+	# distance (a measure of spread) of the final cluster
+	def _calculate_final_cluster(self, rows):
+		centers = self._center_matrix[rows]
+		center = centers.mean(axis=0)
+		avg_density = self._Dk_arr[rows].mean()
+		max_distance = np.abs(centers - center).sum(axis=1).max()
+		label = self._uCs[rows[0]].Classk
 		return label, center, avg_density, max_distance
 
 	# Implements local density analysis stage.
@@ -362,134 +406,162 @@ class SerialDyClee:
 
 	# Performs density analysis on a given list of MicroClusters.
 	# @param	uClist	A list of MicroClusters to analyze.
+	# @param	rows	Array of the storage rows of the MicroClusters.
+	# @param	Dk		Array of the densities of the MicroClusters.
 	# @param	d_avg	The average density of the MicroClusters.
 	# @param 	d_med	The median density of the MicroClusters.
 	# @return			Returns lists of the Dense, Semi-Dense and Low-Density
 	#					MicroClusters.
-	def _density_analysis(self, uClist, d_avg, d_med):
-		DMC, SDMC, LDMC = [],[],[] # Dense, Semi-Dense, Low-Density
-		for uC in uClist:
-			if uC.Dk >= d_avg and uC.Dk >= d_med:
-				uC.set_density_type("Dense")
-				# Organize dense clusters so as to prioritize classed dense
-				# clusters as seeds first to avoid unnecessary label
-				# generation and re-labeling
-				if uC.Classk != 'Unclassed':
-					DMC.insert(0, uC)
-				else:
-					DMC.append(uC)
-			elif uC.Dk >= d_avg or uC.Dk >= d_med:
-				uC.set_density_type("Semi-Dense")
-				SDMC.append(uC)
-			else:
-				uC.set_density_type("Low-Density")
-				LDMC.append(uC)
+	def _density_analysis(self, uClist, rows, Dk, d_avg, d_med):
+		above_avg = Dk >= d_avg
+		above_med = Dk >= d_med
+		dense_mask = above_avg & above_med
+		semi_mask = above_avg ^ above_med
+		low_mask = ~(above_avg | above_med)
+
+		# Organize dense clusters so as to prioritize classed dense clusters
+		# (latest first) as seeds first to avoid unnecessary label generation
+		# and re-labeling
+		mc = self._mc
+		dense_rows = np.flatnonzero(dense_mask)
+		is_classed = mc.class_code[rows[dense_rows]] != UNCLASSED
+		dense_rows = np.concatenate([dense_rows[is_classed][::-1],
+			dense_rows[~is_classed]])
+
+		DMC = [uClist[i] for i in dense_rows] # Dense
+		SDMC = [uClist[i] for i in np.flatnonzero(semi_mask)] # Semi-Dense
+		LDMC = [uClist[i] for i in np.flatnonzero(low_mask)] # Low-Density
+		mc.density_type[rows[dense_mask]] = "Dense"
+		mc.was_dense[rows[dense_mask]] = True
+		mc.density_type[rows[semi_mask]] = "Semi-Dense"
+		mc.density_type[rows[low_mask]] = "Low-Density"
 
 		return DMC, SDMC, LDMC
 
 	# Implements algorithm 2, density stage - global analysis.
 	# Returns updated A-list and O-list
 	def _density_stage_global(self, tX):
-		g_avg, g_med = self._get_avg_med_density(chain(self.A_list,
-			self.O_list))
-		DMC, SDMC, LDMC = self._density_analysis(chain(self.A_list,
-			self.O_list), g_avg, g_med)
-		already_seen = set()
+		self._index_microclusters()
+		self._refresh_densities(tX)
+		g_avg, g_med = self._get_avg_med_density(self._Dk_arr)
+		DMC, SDMC, LDMC = self._density_analysis(self._uCs, self._rows,
+			self._Dk_arr, g_avg, g_med)
 		final_clusters = []
 
 		if self.use_kdtree:
 			self._construct_kdtree()
+		else:
+			if self.var_check:
+				self._update_variances()
+			self._construct_connectivity()
+
+		# Breadth-first searches run over density stage rows, with per-row
+		# flags computed once: density types and pre-stage labels of unseen
+		# microclusters do not change during the search.
+		uCs = self._uCs
+		mc = self._mc
+		already_seen = np.zeros(len(uCs), dtype=bool)
+		if self.label_voting:
+			not_outlier = mc.density_type[self._rows] != "Outlier"
+			classes = mc.class_code[self._rows]
+			user_labeled = classes > UNCLASSED
+		else:
+			connectable = np.array([self.density_check(uC) for uC in uCs],
+				dtype=bool)
 
 		for uC in DMC:
-			if uC not in already_seen:
-				already_seen.add(uC)
+			seed = uC.density_row
+			if not already_seen[seed]:
+				already_seen[seed] = True
 				## May need to change this to class assignment upon final
 				## cluster formation.
-				if uC.Classk == 'Unclassed':
+				label = mc.class_code[uC.idx]
+				if label == UNCLASSED:
 					label = self._get_next_class_id()
-					uC.Classk = label
-				else:
-					label = uC.Classk
-				final_cluster = [uC] # Create "final cluster"
-				Connected_uC = deque(self.spatial_search(uC))
+					mc.class_code[uC.idx] = label
+				final_cluster = [seed] # Create "final cluster"
+				Connected_uC = deque(self.spatial_search(seed))
 
 				# Optional voting behavior
 				if self.label_voting:
+					classes[seed] = label
 					labels = [label]
 					final_label = None
-					classed = [uC]
+					classed = [seed]
 					outliers = []
 					while len(Connected_uC) != 0:
-						uCneighbor = Connected_uC.popleft()
-						if self._is_not_outlier(uCneighbor) and \
-							uCneighbor not in already_seen:
-							curr_class = uCneighbor.Classk
-							if curr_class != "Unclassed":
-								labels.append(curr_class)
-								classed.append(uCneighbor)
-								if not curr_class.startswith(self.id_prefix):
-									final_label = curr_class
-							already_seen.add(uCneighbor)
-							final_cluster.append(uCneighbor)
-							NewConnected_uC = self.spatial_search(uCneighbor)
-							for newneighbor in NewConnected_uC:
-								if self._is_not_outlier(uCneighbor) and \
-									newneighbor not in already_seen:
+						neighbor = Connected_uC.popleft()
+						if not_outlier[neighbor] and \
+							not already_seen[neighbor]:
+							if classes[neighbor] != UNCLASSED:
+								labels.append(classes[neighbor])
+								classed.append(neighbor)
+								if user_labeled[neighbor]:
+									final_label = classes[neighbor]
+							already_seen[neighbor] = True
+							final_cluster.append(neighbor)
+							for newneighbor in self.spatial_search(neighbor):
+								if already_seen[newneighbor]:
+									continue
+								if not_outlier[newneighbor]:
 									Connected_uC.append(newneighbor)
-									curr_class = newneighbor.Classk
-									if curr_class != "Unclassed":
-										labels.append(newneighbor.Classk)
+									if classes[newneighbor] != UNCLASSED:
+										labels.append(classes[newneighbor])
 										classed.append(newneighbor)
-										if not curr_class.startswith(
-											self.id_prefix):
-											final_label = curr_class
-								elif newneighbor not in already_seen:
+										if user_labeled[newneighbor]:
+											final_label = classes[newneighbor]
+								else:
 									outliers.append(newneighbor)
-									already_seen.add(newneighbor)
+									already_seen[newneighbor] = True
 
 					_, center, avg_density, max_distance = \
 						self._calculate_final_cluster(final_cluster)
 
 					# Label voting
 					if final_label is None:
-						final_label = multimode(labels)
-						if len(final_label) == 1:
-							final_label = final_label[0] # Extract single mode
-						elif len(final_label) == len(final_cluster):
+						# Encode labels in order of first appearance; labels
+						# and classed are aligned
+						label_codes = {}
+						codes = np.array([label_codes.setdefault(l,
+							len(label_codes)) for l in labels], dtype=np.int64)
+						distinct = list(label_codes)
+						counts = np.bincount(codes)
+						modes = np.flatnonzero(counts == counts.max())
+						if len(modes) == 1:
+							final_label = distinct[modes[0]] # Single mode
+						elif len(modes) == len(final_cluster):
 							final_label = label
 						else: # Multiple modes
-							votes = {k : 0 for k in labels}
-							for uC in classed:
-								curr_class = uC.Classk
-								if curr_class in votes:
-									# Votes are weighted by uC density and its
-									# distance from the final cluster center
-									votes[curr_class] += (uC.Dk * (1 /
-										manhattan_distance(uC.center, center)))
-							final_label = max(votes, key=lambda x : votes[x])
+							# Votes are weighted by uC density and its
+							# distance from the final cluster center
+							rows = np.array(classed)
+							weights = self._Dk_arr[rows] * (1 / np.abs(
+								self._center_matrix[rows] - center).sum(axis=1))
+							votes = np.bincount(codes, weights=weights)
+							final_label = distinct[modes[votes[modes].argmax()]]
 
 					# Apply labels
-					for uC in chain(outliers, final_cluster):
-						uC.Classk = final_label
+					mc.class_code[self._rows[outliers + final_cluster]] = \
+						final_label
 
-					final_clusters.append(FinalCluster(final_label, center,
-						avg_density, max_distance))
+					final_clusters.append(FinalCluster(
+						mc.class_labels[final_label], center, avg_density,
+						max_distance))
 
 				# Default behavior
 				else:
 					while len(Connected_uC) != 0:
-						uCneighbor = Connected_uC.popleft()
-						if self.density_check(uCneighbor) and \
-							uCneighbor not in already_seen:
-							uCneighbor.Classk = label
-							already_seen.add(uCneighbor)
-							final_cluster.append(uCneighbor)
-							NewConnected_uC = self.spatial_search(uCneighbor)
-							for newneighbor in NewConnected_uC:
-								if self.density_check(newneighbor) and \
-									newneighbor not in already_seen:
+						neighbor = Connected_uC.popleft()
+						if connectable[neighbor] and \
+							not already_seen[neighbor]:
+							mc.class_code[self._rows[neighbor]] = label
+							already_seen[neighbor] = True
+							final_cluster.append(neighbor)
+							for newneighbor in self.spatial_search(neighbor):
+								if connectable[newneighbor] and \
+									not already_seen[newneighbor]:
 									Connected_uC.append(newneighbor)
-								newneighbor.Classk = label
+								mc.class_code[self._rows[newneighbor]] = label
 
 					# Calculate and store final cluster
 					label, center, avg_density, max_distance = \
@@ -498,15 +570,11 @@ class SerialDyClee:
 						avg_density, max_distance))
 
 		# Process snapshots
-		snap_copies = []
-		if DMC is not None:
-			snap_copies.extend(deepcopy(DMC))
-		if SDMC is not None:
-			snap_copies.extend(deepcopy(SDMC))
-		if LDMC is not None:
-			snap_copies.extend(deepcopy(LDMC))
+		snapshot = Snapshot(self._center_matrix, self._Dk_arr.copy(),
+			np.array([mc.class_labels[code] for code in mc.class_code[
+			self._rows]], dtype=object), mc.density_type[self._rows])
 		self._update_snapshots(tX, {'final': final_clusters,
-			'all': snap_copies})
+			'all': snapshot})
 
 		# Return "message" of updated lists
 		new_A_list = DMC + SDMC # All current dense and semi-dense
@@ -515,6 +583,7 @@ class SerialDyClee:
 		if self.forget_method is None: # No forgetting process
 			new_O_list = LDMC
 		else:
+			new_O_list = []
 			for uC in LDMC:
 				# Check if meets low density threshold (.25 of the global
 				# density average), or was created recently (to avoid deleting
@@ -536,16 +605,22 @@ class SerialDyClee:
 		pass
 
 
-	# Initializes parameters and returns a time column, target column and
-	# a sum of squares vector.
+	# Initializes parameters and running sums, and returns a time column and
+	# a target column.
 	def _initialize(self, num_instances, num_features, timecol, targetcol):
 		if self.common_dims is None: # Initialize common dimensions
 			self.common_dims = num_features - self.uncdim
 
 		if self.context is None: # Initialize context matrix
 			self.context = np.zeros((3, num_features), dtype=np.float64)
+			self._adaptive_ranges = np.ones(num_features, dtype=np.float64)
 			self.variances = np.zeros((1, num_features), dtype=np.float64)
 
+			# Hyperbox statistics only depend on phi and the dimensionality
+			self.hyperbox_sizes = self._get_hyperbox_sizes()
+			self.hyperbox_volume = self._get_hyperbox_volume()
+			self._halved_sizes = (self.hyperbox_sizes / 2).astype(self.dtype)
+
 		# Indices if not time-series data
 		tcol = np.arange(num_instances) if timecol is None else timecol
 
@@ -553,16 +628,25 @@ class SerialDyClee:
 		tgcol = np.array(["Unclassed"] * num_instances) if targetcol is None \
 			else targetcol
 
-		ssq = np.zeros(num_features, dtype=np.float64)
+		# Columnar storage of all microclusters
+		if self._mc is None:
+			self._mc = MicroClusterStore(num_features, self.forget_method,
+				dtype=self.dtype)
 
-		return tcol, tgcol, ssq
+		# Running sum and sum of squares of the instances, for variances
+		self._instance_count = 0
+		self._total_S = np.zeros(num_features, dtype=np.float64)
+		self._total_SS = np.zeros(num_features, dtype=np.float64)
+		self._x2_buf = np.empty(num_features, dtype=np.float64)
+
+		return tcol, tgcol
 
 
 	# Runs the DyClee algorithm on a finite dataset using episode abstraction.
 	def run_dataset_w_abstraction(self, data, timecol=None, targetcol=None,
 		max_window=None):
 		num_instances, num_features = data.shape
-		timecol, targetcol, total_SS = self._initialize(num_instances,
+		timecol, targetcol = self._initialize(num_instances,
 			num_features, timecol, targetcol)
 		mw = math.floor(num_instances/2) if max_window is None else max_window
 
@@ -572,15 +656,30 @@ class SerialDyClee:
 		complete = False
 		current_loc = 0
 		while not complete:
-			# Find suitable window to fit polynomial of degree 2
+			# Find suitable window to fit polynomial of degree 2. All features
+			# are fit at once by least squares on the window's Vandermonde
+			# matrix. Time is taken relative to the start of the window and
+			# columns are scaled to unit norm as in np.polyfit, so that large
+			# time stamps (e.g. epoch seconds) stay well conditioned; the
+			# coefficients are thus in time since the window start. The last
+			# fit is that of the chosen window.
 			curr_window_length = mw
 			while curr_window_length > 1:
 				current_bound = current_loc + curr_window_length
-				totalvar = np.sum(np.var(
-					data[current_loc:current_bound], axis=0))
-				coefs, residuals, rank, singular_values, rcond = np.polyfit(
-					timecol[current_loc:current_bound],
-					data[current_loc:current_bound], 2, full=True)
+				window = data[current_loc:current_bound]
+				totalvar = np.sum(np.var(window, axis=0))
+				t = np.asarray(timecol[current_loc:current_bound],
+					dtype=np.float64)
+				vander = np.vander(t - t[0], 3)
+				scale = np.sqrt(np.square(vander).sum(axis=0))
+				scale[scale == 0] = 1
+				coefs = np.linalg.lstsq(vander / scale, window,
+					rcond=len(vander) * np.finfo(np.float64).eps)[0]
+				coefs = (coefs.T / scale).T
+
+				# Residuals are computed explicitly, as lstsq omits them for
+				# rank-deficient or short windows
+				residuals = np.square(window - vander @ coefs).sum(axis=0)
 				totalres = np.sum(residuals)
 				if totalres > totalvar:
 					curr_window_length = math.floor(curr_window_length / 2)
@@ -588,9 +687,6 @@ class SerialDyClee:
 					break
 
 			# Insert coefficients as instance
-			coefs, residuals, rank, singular_values, rcond = np.polyfit(
-					timecol[current_loc:current_bound],
-					data[current_loc:current_bound], 2, full=True)
 
 			#inserteduC = self._distance_stage(, tX, X_class)
 
@@ -612,38 +708,38 @@ class SerialDyClee:
 	#					was inserted took on.
 	def run_dataset(self, data, timecol=None, targetcol=None):
 		num_instances, num_features = data.shape
-		timecol, targetcol, total_SS = self._initialize(num_instances,
+		timecol, targetcol = self._initialize(num_instances,
 			num_features, timecol, targetcol)
 
+		# Normalize all data up front when the context is fixed
+		if self.norm_func == self._normalize:
+			data = self._normalize(data)
+
 		# Primary loop
 		clustering_results=[]
 		count_since_last_density = 0
 		for i in range(num_instances):
-			X = self.norm_func(data[i]) # Normalize data
+			X = data[i] if self.norm_func == self._normalize else \
+				self.norm_func(data[i]) # Normalize data
 			tX = timecol[i]
 			X_class = targetcol[i]
 
-			# Variance calculations
+			# Variance calculations, in place
 			if self.var_check:
-				total_SS += np.power(X, 2) # Update sum of squares
-				self.variances = total_SS/(i+1) # Current variances
+				self._instance_count += 1
+				self._total_S += X # Update sum
+				np.multiply(X, X, out=self._x2_buf)
+				self._total_SS += self._x2_buf # Update sum of squares
 
-			# Run distance stage - append MicroCluster reference to results
+			# Run distance stage - append MicroCluster reference to results.
+			# Microclusters are decayed lazily, when touched.
 			clustering_results.append(self._distance_stage(X, tX, X_class))
 
-			# Decay all microclusters
-			for uC in chain(self.A_list, self.O_list):
-				uC.update_cluster(tX)
-				uC.update_density(self.hyperbox_volume)
-
 			# Run density stage
 			count_since_last_density += 1
 			if count_since_last_density == self.t_global:
 				count_since_last_density = 0
-				new_A, new_O, long_term_mem_additional = self.density_stage(tX)
-				self.A_list = new_A
-				self.O_list = new_O
-				self.long_term_mem.extend(long_term_mem_additional)
+				self._update_lists(tX, *self.density_stage(tX))
 
 		return np.array([uC.Classk for uC in clustering_results])
 
@@ -1,3 +1,6 @@
+from collections import namedtuple
+from types import SimpleNamespace
+
 import numpy as np
 
 # Citation:
@@ -6,83 +9,257 @@ import numpy as np
 # Pattern Recognition, Elsevier, 2019, 94, pp.162-186.
 # 10.1016/j.patcog.2019.05.024 . hal-02135580
 
+# List membership tags of the rows of a MicroClusterStore
+NO_LIST, A_LIST, O_LIST, LTM_LIST = -1, 0, 1, 2
+
+# Class code of unclassed MicroClusters. Codes of user-provided labels are
+# positive and codes of generated labels are negative.
+UNCLASSED = 0
+
+# Columnar (structure-of-arrays) storage of MicroClusters: each MicroCluster
+# is a row index into one array per field, so that a field of all
+# MicroClusters is contiguous in memory and can be processed with vectorized
+# operations. Rows are never reused, see compact().
+class MicroClusterStore:
+	# Fields of the feature vector and calculated statistics, with their
+	# dtypes (None for the store's center dtype) and whether they hold one
+	# value per dimension.
+	fields = (("nk", np.float64, False), ("LSk", np.float64, True),
+		("SSk", np.float64, True), ("tlk", np.float64, False),
+		("tsk", np.float64, False), ("Dk", np.float64, False),
+		("class_code", np.int64, False), ("center", None, True),
+		("variance", np.float64, True), ("density_type", object, False),
+		("was_dense", bool, False), ("last_touched", np.float64, False),
+		("list_tag", np.int8, False), ("list_pos", np.int64, False),
+		("density_row", np.int64, False),
+		("handles", object, False))
+	field_names = frozenset(name for name, _, _ in fields)
+
+	# @param num_features		Number of dimensions of the instances.
+	# @param decay_function		A decay function (callable) to apply for
+	# 							the forgetting process.
+	# @param capacity			Initial number of rows.
+	# @param dtype				Floating point type of the centers.
+	def __init__(self, num_features, decay_function=None, capacity=64,
+		dtype=np.float64):
+		self.num_features = num_features
+		self.dtype = dtype
+		self.n = 0 # Number of rows in use
+		for name, field_dtype, per_dim in self.fields:
+			shape = (capacity, num_features) if per_dim else (capacity,)
+			setattr(self, name, np.zeros(shape, dtype=field_dtype or dtype))
+
+		# Function for forgetting process
+		if decay_function is None:
+			self.decay_function = lambda t, t2 : 1
+		else:
+			self.decay_function = decay_function
+
+		# Class labels by code, and codes of user-provided labels
+		self.class_labels = {UNCLASSED: "Unclassed"}
+		self.class_codes = {"Unclassed": UNCLASSED}
+
+
+	# Returns the code of class label X_class, assigning a new positive code
+	# to labels not seen before.
+	def encode_class(self, X_class):
+		code = self.class_codes.get(X_class)
+		if code is None:
+			code = self.class_codes[X_class] = len(self.class_codes)
+			self.class_labels[code] = X_class
+		return code
+
+
+	# Helper function to reserve a new row, doubling capacity when full.
+	def _new_row(self):
+		capacity = self.nk.shape[0]
+		if self.n == capacity:
+			for name, _, _ in self.fields:
+				column = getattr(self, name)
+				setattr(self, name, np.resize(column,
+					(2 * capacity,) + column.shape[1:]))
+		self.n += 1
+		return self.n - 1
+
+
+	# Adds the row of a MicroCluster created with instance X and returns its
+	# index. Parameter descriptions can be found in MicroCluster.__init__.
+	def add(self, X, tX, V, X_class=None):
+		i = self._new_row()
+		# Feature Vector - page 5
+		self.nk[i] = 1
+		self.LSk[i] = X
+		self.SSk[i] = np.power(X, 2)
+		self.tlk[i] = self.tsk[i] = tX
+		self.Dk[i] = 1 / V
+		self.class_code[i] = self.encode_class(X_class) if X_class is not \
+			None else UNCLASSED
+
+		# Calculated statistics
+		self.center[i] = X
+		self.variance[i] = 0
+		self.density_type[i] = "Outlier"
+		self.was_dense[i] = False
+		self.last_touched[i] = tX # Time forgetting was last applied
+
+		# Owning list and position in it, and row in the density stage
+		# center matrix
+		self.list_tag[i] = NO_LIST
+		self.list_pos[i] = -1
+		self.density_row[i] = -1
+		return i
+
+
+	# Copies row i to a new row and returns the new row's index.
+	def copy_row(self, i):
+		j = self._new_row()
+		for name, _, _ in self.fields:
+			column = getattr(self, name)
+			column[j] = column[i]
+		return j
+
+
+	# Drops the rows of MicroClusters that belong to no list (forgotten
+	# MicroClusters). Their handles may still be referenced, e.g. by clustering
+	# results, so these rows are moved to a separate store rather than
+	# discarded, and all handles are updated to their new rows.
+	def compact(self):
+		tags = self.list_tag[:self.n]
+		dropped = np.flatnonzero(tags == NO_LIST)
+		if len(dropped) == 0:
+			return
+		kept = np.flatnonzero(tags != NO_LIST)
+		archive = MicroClusterStore(self.num_features, self.decay_function,
+			len(dropped), self.dtype)
+		archive.class_labels = self.class_labels
+		archive.class_codes = self.class_codes
+		for name, _, _ in self.fields:
+			column = getattr(self, name)
+			getattr(archive, name)[:] = column[dropped]
+			column[:len(kept)] = column[kept]
+		archive.n = len(dropped)
+		self.n = len(kept)
+		for i, uC in enumerate(archive.handles):
+			uC.store, uC.idx = archive, i
+		for i in range(self.n):
+			self.handles[i].idx = i
+
+
 # Implements the mu-cluster or micro-cluster as described in the 2019 DyClee
-# paper.
+# paper. A MicroCluster is a handle on its row of a MicroClusterStore: its
+# fields are read and written as attributes, e.g. uC.center, uC.nk.
 class MicroCluster:
+	__slots__ = ("idx", "store")
+
 	# MicroCluster only ever created with a new instance that does not belong
 	# to another microcluster.
+	# @param store				MicroClusterStore holding the fields.
 	# @param X					Initial data instance (NumPy array).
 	# @param tX					Time stamp of X.
 	# @param V					Current hyperbox volume.
 	# @param X_class			Class of instance X, if known.
-	# @param decay_function		A decay function (callable) to apply for
-	# 							the forgetting process.
-	def __init__(self, X, tX, V, X_class=None, decay_function=None):
-		# Feature Vector - page 5
-		self.nk = 1
-		self.LSk = X
-		self.SSk = np.power(X, 2)
-		self.tlk = self.tsk = tX
-		self.Dk = 1 / V
-		self.Classk = X_class if X_class is not None else "Unclassed"
+	def __init__(self, store, X, tX, V, X_class=None):
+		self._attach(store, store.add(X, tX, V, X_class))
 
-		# Calculated statistics
-		self.center = X
-		self.variance = np.zeros(X.shape, dtype=np.float64)
-		self.density_type = "Outlier"
-		self.was_dense = False
 
-		# Function for forgetting process
-		if decay_function is None:
-			self.decay_function = lambda t, t2 : 1
+	# Helper function to point the handle to row i of store.
+	def _attach(self, store, i):
+		object.__setattr__(self, "store", store)
+		object.__setattr__(self, "idx", i)
+		store.handles[i] = self
+
+
+	def __getattr__(self, name):
+		if name not in MicroClusterStore.field_names:
+			raise AttributeError(name)
+		return getattr(self.store, name)[self.idx]
+
+
+	def __setattr__(self, name, value):
+		if hasattr(MicroCluster, name): # Slots and properties
+			object.__setattr__(self, name, value)
+		elif name in MicroClusterStore.field_names:
+			getattr(self.store, name)[self.idx] = value
 		else:
-			self.decay_function = decay_function
+			raise AttributeError(name)
+
+
+	# Function for forgetting process
+	@property
+	def decay_function(self):
+		return self.store.decay_function
+
+
+	# Class label, stored as a class code
+	@property
+	def Classk(self):
+		return self.store.class_labels[self.store.class_code[self.idx]]
+
+
+	@Classk.setter
+	def Classk(self, X_class):
+		self.store.class_code[self.idx] = self.store.encode_class(X_class)
 
 
 	# Helper function to calculate center based on feature vector
 	def get_center(self):
-		return self.LSk / self.nk
+		store, i = self.store, self.idx
+		return store.LSk[i] / store.nk[i]
 
 
 	# Helper function to calculate variance based on feature vector
 	def get_variance(self):
-		return (self.SSk / self.nk) - np.power((self.LSk / self.nk), 2)
+		store, i = self.store, self.idx
+		return (store.SSk[i] / store.nk[i]) - np.power(
+			(store.LSk[i] / store.nk[i]), 2)
 
 
 	# Method to update MicroCluster with new instance X
 	# Parameter descriptions can be found in __init__ comments.
 	def insert(self, X, tX, X_class=None):
-		self.nk += 1 # Sample count
-		self.LSk += X # Linear sum
-		self.SSk += np.power(X,2) # Squared sum
-		self.tlk = tX # Update last assignment time
-		self.center = self.get_center()
-		self.variance = self.get_variance()
+		store, i = self.store, self.idx
+		store.nk[i] += 1 # Sample count
+		store.LSk[i] += X # Linear sum
+		store.SSk[i] += np.power(X,2) # Squared sum
+		store.tlk[i] = tX # Update last assignment time
+		store.center[i] = self.get_center()
+		store.variance[i] = self.get_variance()
 		if X_class is not None and self.Classk is None:
 			self.Classk = X_class # Update class
 
 
-	# Method for all MicroClusters to be updated upon time increment
+	# Method to apply the forgetting process for the time elapsed since the
+	# MicroCluster was last decayed.
 	# @param tX		Current time.
 	def update_cluster(self, tX):
-		decay_factor = self.decay_function(tX, self.tlk)
-		self.nk = (self.nk * decay_factor)
-		self.LSk = (self.LSk * decay_factor)
-		self.SSk = (self.SSk * decay_factor)
+		store, i = self.store, self.idx
+		decay_factor = store.decay_function(tX, store.last_touched[i])
+		store.nk[i] *= decay_factor
+		store.LSk[i] *= decay_factor
+		store.SSk[i] *= decay_factor
+		store.last_touched[i] = tX
 
 
 	# Method to update density upon hyperbox volume change, as in adaptive
 	# normalization.
 	# @param V		Current hyperbox volume.
 	def update_density(self, V):
-		self.Dk = self.nk / V
+		self.store.Dk[self.idx] = self.store.nk[self.idx] / V
+
+
+	# Returns a copy of the MicroCluster, in a new row of the same store.
+	def clone_state(self):
+		clone = MicroCluster.__new__(MicroCluster)
+		clone._attach(self.store, self.store.copy_row(self.idx))
+		return clone
 
 
 	# Setter for density_type
 	def set_density_type(self, density_type):
-		self.density_type = density_type
-		if not self.was_dense and density_type == "Dense":
-			self.was_dense = True
+		store, i = self.store, self.idx
+		store.density_type[i] = density_type
+		if density_type == "Dense":
+			store.was_dense[i] = True
 
 class FinalCluster:
 	def __init__(self, label, center, density, max_distance):
@@ -90,3 +267,17 @@ class FinalCluster:
 		self.center = center
 		self.density = density
 		self.max_distance = max_distance
+
+
+# Columnar record of all micro-clusters at a density stage, as stored in the
+# snapshot history: an m x d matrix of centers and arrays of the densities,
+# labels and density types of the m micro-clusters.
+class Snapshot(namedtuple('Snapshot', 'centers Dk classes dtypes')):
+	__slots__ = ()
+
+	# Lazily inflates the snapshot into one object per micro-cluster, exposing
+	# the center, Dk, Classk and density_type attributes of a MicroCluster.
+	def inflate(self):
+		for center, Dk, Classk, density_type in zip(*self):
+			yield SimpleNamespace(center=center, Dk=Dk, Classk=Classk,
+				density_type=density_type)
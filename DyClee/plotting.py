@@ -41,7 +41,7 @@ def plot_snapshots(timestamp_order, snapshots_ordered, display_class=False):
 
 	for i, t in enumerate(timestamp_order): 
 		final_list = snapshots_ordered[t]['final']
-		micro_list = snapshots_ordered[t]['all']
+		micro_snapshot = snapshots_ordered[t]['all']
 
 		# plot final cluster
 		final_df = pd.DataFrame([uC.center for uC in final_list], columns=['x', 'y'])
@@ -55,8 +55,8 @@ def plot_snapshots(timestamp_order, snapshots_ordered, display_class=False):
 		axes[i][0].set_ylabel(t, rotation=0, size='xx-large', weight='bold')
 		
 		# plot micro clusters 
-		micro_df = pd.DataFrame([uC.get_center() for uC in micro_list], columns=['x', 'y'])
-		micro_class = np.array([uC.Classk for uC in micro_list])
+		micro_df = pd.DataFrame(micro_snapshot.centers, columns=['x', 'y'])
+		micro_class = micro_snapshot.classes
 		m_plot = sns.scatterplot(ax=axes[i][1], x='x',y='y',hue=micro_class,data=micro_df)
 		m_plot.legend(loc='lower left', bbox_to_anchor=(1.05,0), ncol=1)
 		if (display_class): 
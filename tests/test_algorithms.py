@@ -0,0 +1,43 @@
+import numpy as np
+
+from DyClee.algorithms import SerialDyClee
+from DyClee.clusters import MicroCluster
+
+
+# Equally close and equally dense microclusters: the first one in its list
+# takes the instance, whatever their creation order.
+def test_distance_ties_follow_list_order():
+	dyclee = SerialDyClee(phi=0.5, context=np.array([[0.0, 0.0], [1.0, 1.0]]))
+	dyclee._initialize(1, 2, None, None)
+	V = dyclee.hyperbox_volume
+	first_created = MicroCluster(dyclee._mc, np.array([0.375, 0.5]), 0, V)
+	second_created = MicroCluster(dyclee._mc, np.array([0.625, 0.5]), 0, V)
+	dyclee._add_to_O_list(second_created)
+	dyclee._add_to_O_list(first_created)
+	assert dyclee._distance_stage(np.array([0.5, 0.5]), 1) is second_created
+
+
+# Values on a 0.1 grid, for which distance ties are frequent. The expected
+# list sizes and label counts are those of the original list-based
+# implementation.
+def test_grid_data_matches_list_based_implementation():
+	rng = np.random.default_rng(0)
+	X = np.round(rng.normal(0, 1 / 3, size=(1000, 3)), 1)
+	dyclee = SerialDyClee(phi=0.1, t_global=50,
+		context=np.vstack([X.min(axis=0), X.max(axis=0)]))
+	labels = dyclee.run_dataset(X)
+	assert (len(dyclee.A_list), len(dyclee.O_list)) == (240, 185)
+	assert len(set(labels)) == 2
+	assert np.count_nonzero(labels == "Unclassed") == 12
+
+
+# Adaptive normalization starts from a zero context, so a constant zero
+# feature never has a range to scale by.
+def test_adaptive_normalization_with_zero_feature():
+	rng = np.random.default_rng(0)
+	X = np.column_stack([rng.normal(size=(500, 2)), np.zeros(500)])
+	dyclee = SerialDyClee(phi=0.1, t_global=50)
+	with np.errstate(all="raise"):
+		labels = dyclee.run_dataset(X)
+	assert len(labels) == 500
+	assert np.isfinite(dyclee._mc.center[:dyclee._mc.n]).all()
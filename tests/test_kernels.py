@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from DyClee import _kernels
+
+pytest.importorskip("numba")
+
+
+# Centers on a 0.1 grid, where exact distance ties are common, plus a NaN row.
+def grid_centers(rng, n, d):
+	C = rng.integers(0, 10, size=(n, d)) / 10
+	C[n // 2] = np.nan
+	return C
+
+
+@pytest.mark.parametrize("d", [2, 3, 9])
+def test_reachable_mask_matches_numpy(d):
+	rng = np.random.default_rng(d)
+	C = grid_centers(rng, 200, d)
+	halved = np.full(d, 0.15)
+	for _ in range(200):
+		X = rng.integers(0, 10, size=d) / 10
+		np.testing.assert_array_equal(_kernels.reachable_mask(C, X, halved),
+			_kernels.reachable_mask_numpy(C, X, halved))
+
+
+@pytest.mark.parametrize("d", [2, 3, 9])
+def test_closest_rows_matches_numpy(d):
+	rng = np.random.default_rng(d)
+	C = grid_centers(rng, 200, d)
+	for _ in range(500):
+		idx = rng.choice(200, size=rng.integers(1, 30), replace=False)
+		X = rng.integers(0, 10, size=d) / 10 + 0.05
+		np.testing.assert_array_equal(_kernels.closest_rows(C, idx, X),
+			_kernels.closest_rows_numpy(C, idx, X))
+
+
+def test_closest_rows_skips_nan_rows():
+	C = np.array([[np.nan, 0.0], [0.5, 0.5]])
+	X = np.zeros(2)
+	for closest_rows in (_kernels.closest_rows, _kernels.closest_rows_numpy):
+		assert list(closest_rows(C, np.array([0, 1]), X)) == [1]
+		assert list(closest_rows(C, np.array([0]), X)) == []
+
+
+@pytest.mark.parametrize("common_dims", [2, 3])
+def test_connectivity_matrix_matches_numpy(common_dims):
+	rng = np.random.default_rng(common_dims)
+	C = grid_centers(rng, 300, 3)
+	sizes = np.full(3, 0.2)
+	np.testing.assert_array_equal(
+		_kernels.connectivity_matrix(C, sizes, common_dims),
+		_kernels.connectivity_matrix_numpy(C, sizes, common_dims))